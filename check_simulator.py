@@ -0,0 +1,126 @@
+"""Regression checks for the simulator that do not need the simulations/ folder.
+
+Run with `python check_simulator.py` (or pytest).
+"""
+from pathlib import Path
+import json
+import sys
+import tempfile
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scheduler"))
+
+from events import STUDENT_LOG, Event, TextLogger
+from simulator import DeadlockError, Simulator
+
+def run_scenario(description: dict) -> str:
+    """Runs the described simulation and returns its text log."""
+    with tempfile.TemporaryDirectory() as folder:
+        sim_file = Path(folder) / "scenario.json"
+        log_file = Path(folder) / "scenario.txt"
+        sim_file.write_text(json.dumps(description))
+        try:
+            Simulator(sim_file, log_file, True).run_simulator()
+        finally:
+            log = log_file.read_text() if log_file.exists() else ""
+    return log
+
+def expect_deadlock(description: dict) -> str:
+    try:
+        run_scenario(description)
+    except DeadlockError as e:
+        return str(e)
+    raise AssertionError("expected a DeadlockError")
+
+def test_two_mutex_deadlock():
+    message = expect_deadlock({"scheduling_algorithm": "RR", "mutexes": [1, 2], "processes": [
+        {"arrival": 0, "total_cpu_time": 100, "mutex": [{"id": 1, "lock": 5}, {"id": 2, "lock": 50}]},
+        {"arrival": 1, "total_cpu_time": 100, "mutex": [{"id": 2, "lock": 5}, {"id": 1, "lock": 50}]},
+    ]})
+    assert message == "Deadlock between processes [1, 2] on mutex 1, mutex 2", message
+
+def test_orphaned_mutex():
+    # Process 3 keeps running, the deadlock must still be reported right away.
+    message = expect_deadlock({"scheduling_algorithm": "RR", "mutexes": [4], "processes": [
+        {"arrival": 0, "total_cpu_time": 100, "mutex": [{"id": 4, "lock": 5}]},
+        {"arrival": 1, "total_cpu_time": 300, "mutex": [{"id": 4, "lock": 5}]},
+        {"arrival": 2, "total_cpu_time": 500},
+    ]})
+    assert message == "Deadlock between processes [2] on mutex 4; mutex 4 is still held by exited process 1", message
+
+def test_semaphore_signaling_is_not_a_deadlock():
+    # Process 1 waits on a semaphore that only process 2 ever signals.
+    log = run_scenario({"scheduling_algorithm": "RR", "semaphores": [{"id": 1, "init_val": 0}], "processes": [
+        {"arrival": 0, "total_cpu_time": 100, "semaphore": [{"id": 1, "p": 5}]},
+        {"arrival": 1, "total_cpu_time": 100, "semaphore": [{"id": 1, "v": 50}]},
+    ]})
+    assert "Process 1 has finished execution and is exiting" in log
+    assert "Process 2 has finished execution and is exiting" in log
+
+# Log written by the simulator before events were introduced, it must stay byte for byte the same.
+GOLDEN_SCENARIO = {"scheduling_algorithm": "Priority", "memory_size_MB": 40, "semaphores": [{"id": 1, "init_val": 1}], "mutexes": [2], "processes": [
+    {"arrival": 0, "total_cpu_time": 30, "priority": 5, "priority_change": [{"arrival": 25, "new_priority": 40}],
+     "semaphore": [{"id": 1, "p": 3}, {"id": 1, "v": 20}], "mutex": [{"id": 2, "lock": 5}, {"id": 2, "unlock": 15}],
+     "memory_access": [{"0x20000010": 10}]},
+    {"arrival": 2, "total_cpu_time": 20, "priority": 10, "type": "Background", "semaphore": [{"id": 1, "p": 2}],
+     "memory_access": [{"0x30000000": 8}]},
+    {"arrival": 4, "total_cpu_time": 10, "needed_memory_MB": 30},
+]}
+GOLDEN_LOG = """\
+0.000ms : Foreground process 1 arrived with priority 5 requesting 10.0MB of memory
+0.000ms : Context switching to pid: 1
+
+0.002ms : Background process 2 arrived with priority 10 requesting 10.0MB of memory
+
+0.003ms : Semaphore 1 initilized with value 1
+0.003ms : Process 1 called p on semaphore 1
+
+0.004ms : Foreground process 3 arrived with priority 32 requesting 30.0MB of memory
+0.004ms : Unable to allocate memory for new process. Dropping process.
+
+0.005ms : Mutex 2 initilized
+0.005ms : Process 1 called lock on mutex 2
+
+0.010ms : Process 1 accessed virtual address 0x20000010 which translates to physical address 0xa00010
+
+0.015ms : Process 1 called unlock on mutex 2
+
+0.020ms : Process 1 called v on semaphore 1
+
+0.025ms : Process 1 set priority to 40
+0.025ms : Context switching to pid: 2
+
+0.027ms : Process 2 called p on semaphore 1
+
+0.033ms : Process 2 tried to access virtual address 0x30000000 which caused a segfault
+0.033ms : Process 2 has trapped and is forcefully exiting
+0.033ms : Context switching to pid: 1
+
+0.038ms : Process 1 has finished execution and is exiting
+0.038ms : Context switching to pid: 0
+
+"""
+
+def test_text_log_format():
+    assert run_scenario(GOLDEN_SCENARIO) == GOLDEN_LOG
+
+def test_text_logger_student_logs():
+    with tempfile.TemporaryDirectory() as folder:
+        log_file = Path(folder) / "log.txt"
+        logger = TextLogger(log_file, batch_size=2)
+        for event in [Event(7, "exit", 1, "Process 1 has finished execution and is exiting"),
+                      Event(7, STUDENT_LOG, 1, "picked next"),
+                      Event(1250, "context_switch", 2, "Context switching to pid: 2")]:
+            logger.publish(event)
+        logger.close()
+        assert log_file.read_text() == ("0.007ms : Process 1 has finished execution and is exiting\n"
+                                        "0.007ms # picked next\n"
+                                        "\n"
+                                        "1.250ms : Context switching to pid: 2\n"
+                                        "\n")
+
+
+if __name__ == "__main__":
+    checks = [check for name, check in list(globals().items()) if name.startswith("test_")]
+    for check in checks:
+        check()
+        print(f"PASS {check.__name__}")
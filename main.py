@@ -1,26 +1,114 @@
 from pathlib import Path
 from itertools import zip_longest
+import hashlib
+import json
 import subprocess
+import sys
+
+CHUNK_SIZE = 1 << 16
+CACHE_FILE = Path(".sim_cache.json")
+SCHEDULER_FOLDER = Path("scheduler/")
+
+def hash_file(hasher, path: Path):
+    with open(path, 'rb') as file:
+        while chunk := file.read(CHUNK_SIZE):
+            hasher.update(chunk)
+
+def scheduler_hash() -> str:
+    hasher = hashlib.sha256()
+    for source in sorted(SCHEDULER_FOLDER.glob("*.py")):
+        hasher.update(source.name.encode())
+        hash_file(hasher, source)
+    return hasher.hexdigest()
+
+def scenario_key(sim_file: Path, correct_file: Path, sources_hash: str) -> str:
+    """Changes whenever the description, the expected output or the scheduler sources change."""
+    hasher = hashlib.sha256(sources_hash.encode())
+    for path in (sim_file, correct_file):
+        hasher.update(b"\0")
+        hash_file(hasher, path)
+    return hasher.hexdigest()
+
+def load_cache() -> dict[str, str]:
+    try:
+        with open(CACHE_FILE) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def identical(output_file: Path, correct_file: Path) -> bool:
+    """Compares both files chunk by chunk, stopping at the first chunk that differs."""
+    with open(output_file, 'rb') as of, open(correct_file, 'rb') as cf:
+        while True:
+            out = of.read(CHUNK_SIZE)
+            if out != cf.read(CHUNK_SIZE):
+                return False
+            if not out:
+                return True
+
+def compare(name: str, output_file: Path, correct_file: Path, first_divergence: bool) -> bool:
+    if identical(output_file, correct_file):
+        return True
+
+    # Byte differences can still be only whitespace, so fall back to comparing stripped lines.
+    passed = True
+    with open(output_file) as of, open(correct_file) as cf:
+        for i, (out, expected) in enumerate(zip_longest(of, cf), start=1):
+            if out:
+                out = out.strip()
+            if expected:
+                expected = expected.strip()
+
+            if out != expected:
+                print(f"FAIL {name}, line {i}: '{out}' was not '{expected}'")
+                passed = False
+                if first_divergence:
+                    break
+    return passed
+
+def print_usage():
+    print("Usage: python main.py <optional --first-divergence> <optional --no-cache>")
+    sys.exit(1)
 
 def main():
+    first_divergence = False
+    use_cache = True
+    for flag in sys.argv[1:]:
+        if flag == "--first-divergence":
+            first_divergence = True
+        elif flag == "--no-cache":
+            use_cache = False
+        else:
+            print_usage()
+
     sim_folder =  Path("simulations/")
     correct_output_folder = Path("correct_output/")
     output_folder = Path("outputs/")
 
-    for sim_file in sim_folder.iterdir():
-        correct_file = correct_output_folder / Path(sim_file.name).with_suffix(".txt")
-        output_file = output_folder / Path(sim_file.name).with_suffix(".txt")
-        subprocess.run(["python", "scheduler/simulator.py", sim_file, output_file])
+    sources_hash = scheduler_hash()
+    cache = load_cache() if use_cache else {}
 
-        with open(output_file) as of, open(correct_file) as cf:
-            for i, (out, expected) in enumerate(zip_longest(of, cf), start=1):
-                if out:
-                    out = out.strip()
-                if expected:
-                    expected = expected.strip()
+    try:
+        for sim_file in sim_folder.iterdir():
+            correct_file = correct_output_folder / Path(sim_file.name).with_suffix(".txt")
+            output_file = output_folder / Path(sim_file.name).with_suffix(".txt")
+            key = scenario_key(sim_file, correct_file, sources_hash)
+            if cache.get(sim_file.name) == key:
+                continue
 
-                if out != expected:
-                    print(f"FAIL {sim_file.stem}, line {i}: '{out}' was not '{expected}'")
+            cache.pop(sim_file.name, None)
+            result = subprocess.run(["python", "scheduler/simulator.py", sim_file, output_file])
+            if result.returncode != 0:
+                print(f"FAIL {sim_file.stem}: simulator exited with code {result.returncode}")
+            elif not output_file.exists():
+                print(f"FAIL {sim_file.stem}: simulator did not write {output_file}")
+            elif compare(sim_file.stem, output_file, correct_file, first_divergence):
+                cache[sim_file.name] = key
+    finally:
+        # Written even if the run is aborted so scenarios that already passed stay cached.
+        if use_cache:
+            with open(CACHE_FILE, 'w') as file:
+                json.dump(cache, file, indent=1)
 
 if __name__ == "__main__":
     main()
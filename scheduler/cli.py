@@ -0,0 +1,65 @@
+"""Command line and server protocol shared by simulator.py, server.py and client.py.
+
+Imports nothing from the simulator so client.py can hand a job to a warm server
+without paying for loading the kernel itself.
+"""
+import os
+import sys
+
+DEFAULT_SOCKET_PATH: str = "/tmp/p0-scheduling.sock"
+SOCKET_PATH_ENV: str = "P0_SIM_SOCKET"
+
+DESCRIPTION: str = "description"
+OUTPUT: str = "output"
+OPTIONS: str = "options"
+STATUS: str = "status"
+ERROR: str = "error"
+ELAPSED: str = "elapsed_s"
+
+def socket_path() -> str:
+    return os.environ.get(SOCKET_PATH_ENV, DEFAULT_SOCKET_PATH)
+
+def print_usage():
+    print("Usage: python simulator.py <simulation_description_path> <log_path> <optional --no-student-logs>")
+    print("           <optional --contention-report <path>> <optional --contention-series <path>>")
+    print("           <optional --samples <path>> <optional --sample-interval <microseconds>>")
+    sys.exit(1)
+
+PATH_OPTIONS = {
+    "--contention-report": "contention_report",
+    "--contention-series": "contention_series",
+    "--samples": "samples",
+}
+
+INT_OPTIONS = {
+    "--sample-interval": "sample_interval",
+}
+
+def parse_args(argv: list[str]) -> dict:
+    """Parses the simulator command line (without the program name) into keyword arguments for simulate()."""
+    if len(argv) < 2:
+        print_usage()
+
+    options = {"sim_description": argv[0], "log_path": argv[1], "student_logs": True}
+    flags = iter(argv[2:])
+    for flag in flags:
+        if flag == "--no-student-logs":
+            options["student_logs"] = False
+        elif flag in PATH_OPTIONS:
+            path = next(flags, None)
+            if path is None:
+                print_usage()
+            options[PATH_OPTIONS[flag]] = path
+        elif flag in INT_OPTIONS:
+            value = next(flags, None)
+            if value is None or not value.isdigit() or int(value) == 0:
+                print_usage()
+            options[INT_OPTIONS[flag]] = int(value)
+        else:
+            print_usage()
+
+    # The interval only means something when samples are written.
+    if "sample_interval" in options and "samples" not in options:
+        print_usage()
+
+    return options
@@ -0,0 +1,55 @@
+"""Drop-in replacement for `python simulator.py ...` that hands the job to a running server.py.
+
+Takes exactly the same arguments as simulator.py. If no server is listening the
+simulation is run in this process instead.
+"""
+import json
+import os
+import socket
+import sys
+
+from cli import DESCRIPTION, OUTPUT, OPTIONS, STATUS, ERROR, parse_args, socket_path
+
+PATH_ARGUMENTS = {"sim_description", "log_path", "contention_report", "contention_series", "samples"}
+
+def submit(options: dict, path: str | None = None) -> dict:
+    """Sends one job to the server and waits for its response.
+    - options are the keyword arguments of simulator.simulate().
+    - Raises FileNotFoundError or ConnectionRefusedError if no server is listening,
+        and other OSErrors if the connection breaks after the job was sent.
+    - Returns an error response if the server closes the connection without replying.
+    """
+    # The server may run in another directory, so every path is sent absolute.
+    options = {name: os.path.abspath(value) if name in PATH_ARGUMENTS else value for name, value in options.items()}
+    job = {
+        DESCRIPTION: options.pop("sim_description"),
+        OUTPUT: options.pop("log_path"),
+        OPTIONS: options,
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path or socket_path())
+        with sock.makefile("rwb") as stream:
+            stream.write(json.dumps(job).encode() + b"\n")
+            stream.flush()
+            reply = stream.readline()
+    if not reply:
+        return {STATUS: "error", ERROR: "Server closed the connection before replying"}
+    return json.loads(reply)
+
+
+if __name__ == "__main__":
+    options = parse_args(sys.argv[1:])
+    try:
+        response = submit(options)
+    except (FileNotFoundError, ConnectionRefusedError):
+        # Only imported here so that jobs sent to the server do not pay for loading the simulator.
+        from simulator import simulate
+        simulate(**options)
+        sys.exit(0)
+    except OSError as e:
+        print(f"Lost connection to the simulation server: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if response[STATUS] != "ok":
+        print(response[ERROR], file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,86 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+MICRO_S = int
+PID = int
+
+STUDENT_LOG: str = "student"
+
+@dataclass
+class Event:
+    """Something that happened in the simulation.
+    - kind identifies what happened, e.g. "arrival", "context_switch" or "semaphore_p".
+    - pid is the process the event is about (0 for the idle process).
+    - args holds the kind specific details, e.g. the semaphore id.
+    - message is the human readable line written to the text log.
+    """
+    time: MICRO_S
+    kind: str
+    pid: PID
+    message: str
+    args: dict[str, Any] = field(default_factory = dict)
+
+class Subscriber(ABC):
+    """Receives simulation events in batches of up to batch_size.
+    - Events are delivered synchronously, so a slow subscriber slows down the simulation
+        instead of letting undelivered events pile up.
+    """
+    batch_size: int
+    pending: list[Event]
+
+    def __init__(self, batch_size: int = 1):
+        assert(batch_size >= 1)
+        self.batch_size = batch_size
+        self.pending = []
+
+    def publish(self, event: Event):
+        self.pending.append(event)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            events = self.pending
+            self.pending = []
+            self.on_events(events)
+
+    @abstractmethod
+    def on_events(self, events: list[Event]):
+        pass
+
+    def close(self):
+        self.flush()
+
+class CallbackSubscriber(Subscriber):
+    def __init__(self, callback: Callable[[list[Event]], None], batch_size: int = 1):
+        super().__init__(batch_size)
+        self.callback = callback
+
+    def on_events(self, events: list[Event]):
+        self.callback(events)
+
+class TextLogger(Subscriber):
+    """Writes events in the simulator's text log format, with a blank line after every tick that logged something."""
+    def __init__(self, logfile_path: Path | str, batch_size: int = 64):
+        super().__init__(batch_size)
+        self.file = open(logfile_path, 'w')
+        self.last_time: MICRO_S | None = None
+
+    def on_events(self, events: list[Event]):
+        lines = []
+        for event in events:
+            if self.last_time is not None and event.time != self.last_time:
+                lines.append("\n")
+            self.last_time = event.time
+            delimiter = '#' if event.kind == STUDENT_LOG else ':'
+            lines.append(f"{event.time / 1000:.3f}ms {delimiter} {event.message}\n")
+        self.file.writelines(lines)
+
+    def close(self):
+        super().close()
+        if self.last_time is not None:
+            self.file.write("\n")
+            self.last_time = None
+        self.file.close()
@@ -1,6 +1,7 @@
 ### Fill in the following information before submitting
 # Group id: 3
 # Members: Brayden Rudisill, Rhea Jethvani
+from collections import Counter
 from heapq import heappop, heappush
 from dataclasses import dataclass, field
 from logging import Logger
@@ -52,11 +53,101 @@ class Mutex:
     def release(self):
         self.owner = None
 
+Resource = tuple[str, int]
+"""A semaphore or mutex in the wait-for graph, e.g. ("mutex", 3)."""
+
+@dataclass
+class Deadlock:
+    pids: list[PID]
+    resources: list[Resource]
+    orphaned: dict[Resource, PID] = field(default_factory = dict)
+
+    def __str__(self):
+        resources = ", ".join(f"{kind} {id}" for kind, id in self.resources)
+        message = f"Deadlock between processes {self.pids} on {resources}"
+        for (kind, id), pid in self.orphaned.items():
+            message += f"; {kind} {id} is still held by exited process {pid}"
+        return message
+
+@dataclass
+class WaitForGraph:
+    """Tracks which process is blocked on which resource and who holds each resource.
+    - A blocked process waits on exactly one resource, so finding a deadlock only walks
+        the processes reachable from the one that just blocked instead of the whole graph.
+    - Semaphore holders are the processes that acquired a unit and have not released one yet.
+    - A mutex whose owner exited can never be unlocked again, it stays orphaned.
+    """
+    blocked_on: dict[PID, Resource] = field(default_factory = dict)
+    holders: dict[Resource, Counter[PID]] = field(default_factory = dict)
+    orphaned: dict[Resource, PID] = field(default_factory = dict)
+
+    def hold(self, resource: Resource, pid: PID):
+        self.holders.setdefault(resource, Counter())[pid] += 1
+
+    def release(self, resource: Resource, pid: PID):
+        holders = self.holders.get(resource)
+        if holders and holders[pid] > 0:
+            holders[pid] -= 1
+            if holders[pid] == 0:
+                del holders[pid]
+
+    def exit(self, pid: PID) -> list[Resource]:
+        """Drops everything pid holds and returns the mutexes that are orphaned by it."""
+        orphaned = []
+        for resource, holders in self.holders.items():
+            if pid in holders:
+                del holders[pid]
+                if resource[0] == "mutex":
+                    self.orphaned[resource] = pid
+                    orphaned.append(resource)
+        return orphaned
+
+    def block(self, resource: Resource, pid: PID) -> Deadlock | None:
+        """Returns the deadlock pid is now part of, if any."""
+        self.blocked_on[pid] = resource
+        return self.find_deadlock(pid)
+
+    def wake(self, resource: Resource, pid: PID):
+        """pid was handed the resource it was waiting on."""
+        del self.blocked_on[pid]
+        self.hold(resource, pid)
+
+    def find_deadlock(self, pid: PID) -> Deadlock | None:
+        """A deadlock exists when every holder reachable from pid is itself blocked,
+        or when a resource on the way is an orphaned mutex.
+        Other resources without holders (e.g. a semaphore used for signaling) can still be
+        released by anyone, so they never take part in a deadlock.
+        """
+        pids = [pid]
+        resources = []
+        orphaned = {}
+        seen = {pid}
+        for waiting in pids:
+            resource = self.blocked_on[waiting]
+            if resource not in resources:
+                resources.append(resource)
+            if resource in self.orphaned:
+                orphaned[resource] = self.orphaned[resource]
+                continue
+            holders = self.holders.get(resource)
+            if not holders:
+                return None
+            for holder in holders:
+                if holder not in self.blocked_on:
+                    return None
+                if holder not in seen:
+                    seen.add(holder)
+                    pids.append(holder)
+        return Deadlock(sorted(pids), resources, orphaned)
+
 @dataclass
 class MMU:
     available_memory : list[range] = field(default_factory = list)
     reserved_memory: dict[PID, range] = field(default_factory = dict)
     logger: Logger | None = None
+    # Kept up to date by reserve and free so they can be read without walking the block lists.
+    memory_size: int = 0
+    reserved_bytes: int = 0
     def translate(self, address: int, pid: PID) -> int | None:
         mem = self.reserved_memory[pid]
         phys_addr = address - 0x20000000 + mem.start
@@ -68,11 +159,13 @@ class MMU:
                 self.available_memory.remove(block)
                 self._add_available(range(block.start+num_bytes, block.stop))
                 self.reserved_memory[pid] = range(block.start, block.start + num_bytes)
+                self.reserved_bytes += num_bytes
                 return True
         return False
 
     def free(self, pid: PID):
         freed_block = self.reserved_memory.pop(pid)
+        self.reserved_bytes -= len(freed_block)
 
         remaining_blocks = []
         for block in self.available_memory:
@@ -86,6 +179,10 @@ class MMU:
         self.available_memory = remaining_blocks
         self._add_available(freed_block)
 
+    def largest_available(self) -> int:
+        # available_memory is sorted by size, so the largest block is last.
+        return len(self.available_memory[-1]) if self.available_memory else 0
+
     def _add_available(self, r):
         self.available_memory.append(r)
         self.available_memory.sort(key = lambda b: (len(b), b.start))
@@ -102,6 +199,7 @@ class Kernel:
         self.logger = logger
         self.mmu = mmu
         self.mmu.available_memory = [range(memory_size)]
+        self.mmu.memory_size = memory_size
         self.mmu.logger = logger
         self.mmu.reserve(10_485_760, 0)  # 10 MiB
 
@@ -117,6 +215,10 @@ class Kernel:
 
         self.semaphores: dict[int, Semaphore] = {}
         self.mutexes: dict[int, Mutex] = {}
+        self.wait_for: WaitForGraph = WaitForGraph()
+        self.deadlock: Deadlock | None = None
+        # Set by the simulator when contention profiling is enabled.
+        self.profiler = None
 
     
     def new_process_arrived(self, new_process: PID, priority: int, process_type: str, memory_needed: int) -> PID | Literal[-1]:
@@ -197,6 +299,10 @@ class Kernel:
 
     def syscall_exit(self) -> PID:
         self.mmu.free(self.running.pid)
+        for resource in self.wait_for.exit(self.running.pid):
+            waiting = self.mutexes[resource[1]].waiting
+            if waiting and (deadlock := self.wait_for.find_deadlock(waiting[0].pid)):
+                self.deadlock = deadlock
         if self.scheduling_algorithm != "Multilevel":
             self.time_elapsed = 0
         elif self.current_level == "Foreground":
@@ -217,20 +323,26 @@ class Kernel:
         self.semaphores[semaphore_id] = Semaphore(initial_value)
 
     def syscall_semaphore_p(self, semaphore_id: int) -> PID:
+        resource = ("semaphore", semaphore_id)
         if self.semaphores[semaphore_id].acquire_by(self.running):
+            self.acquired(resource, self.running)
             return self.running.pid
 
+        self.block(resource, self.running)
         self.set_running(self.choose_next_process())
         return self.running.pid
 
     def syscall_semaphore_v(self, semaphore_id: int) -> PID:
+        resource = ("semaphore", semaphore_id)
         sem = self.semaphores[semaphore_id]
         sem.release()
+        self.released(resource, self.running)
 
         if self.scheduling_algorithm == "Priority":
             if sem.waiting:
                 sem.waiting.sort()
                 next_p = sem.waiting.pop(0)
+                self.wake(resource, next_p)
                 if self.running >= next_p:
                     self.add_to_queue(self.running)
                     self.set_running(next_p)
@@ -240,7 +352,9 @@ class Kernel:
 
         if sem.waiting:
             sem.waiting.sort(key=lambda pcb: pcb.pid)
-            self.add_to_queue(sem.waiting.pop(0))
+            next_p = sem.waiting.pop(0)
+            self.wake(resource, next_p)
+            self.add_to_queue(next_p)
 
         return self.running.pid
 
@@ -248,7 +362,11 @@ class Kernel:
         self.mutexes[mutex_id] = Mutex()
 
     def syscall_mutex_lock(self, mutex_id: int) -> PID:
-        if not self.mutexes[mutex_id].lock_by(self.running):
+        resource = ("mutex", mutex_id)
+        if self.mutexes[mutex_id].lock_by(self.running):
+            self.acquired(resource, self.running)
+        else:
+            self.block(resource, self.running)
             self.set_running(self.choose_next_process())
 
         return self.running.pid
@@ -257,16 +375,45 @@ class Kernel:
         self.time_elapsed = 0
         self.running = pcb
 
+    def acquired(self, resource: Resource, pcb: PCB):
+        """Records that pcb got resource without waiting."""
+        self.wait_for.hold(resource, pcb.pid)
+        if self.profiler:
+            self.profiler.acquired(resource, pcb.pid)
+
+    def released(self, resource: Resource, pcb: PCB):
+        self.wait_for.release(resource, pcb.pid)
+        if self.profiler:
+            self.profiler.released(resource, pcb.pid)
+
+    def block(self, resource: Resource, pcb: PCB):
+        """Records that pcb is waiting on resource and remembers any deadlock this causes."""
+        if deadlock := self.wait_for.block(resource, pcb.pid):
+            self.deadlock = deadlock
+        if self.profiler:
+            self.profiler.blocked(resource, pcb.pid)
+
+    def wake(self, resource: Resource, pcb: PCB):
+        """Records that pcb was handed the resource it was waiting on."""
+        self.wait_for.wake(resource, pcb.pid)
+        if self.deadlock and pcb.pid in self.deadlock.pids:
+            self.deadlock = None
+        if self.profiler:
+            self.profiler.woken(resource, pcb.pid)
+
     def syscall_mutex_unlock(self, mutex_id: int) -> PID:
 
+        resource = ("mutex", mutex_id)
         mut = self.mutexes[mutex_id]
         if mut.owner is self.running:
+            self.released(resource, self.running)
             if mut.waiting:
                 if self.scheduling_algorithm == "Priority":
                     mut.waiting.sort()
 
                 next_proc = mut.waiting.pop(0)
                 mut.owner = next_proc
+                self.wake(resource, next_proc)
                 if self.scheduling_algorithm == "Priority" and next_proc < self.running:
                     self.add_to_queue(self.running)
                     self.set_running(next_proc)
@@ -0,0 +1,133 @@
+from dataclasses import dataclass, field
+from typing import Callable, TextIO
+import csv
+
+from kernel import PID, Resource
+
+MICRO_S = int
+
+PERCENTILES = (50, 95, 99)
+
+@dataclass
+class ResourceStats:
+    acquisitions: int = 0
+    contended_acquisitions: int = 0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    blocked_times: list[MICRO_S] = field(default_factory = list)
+    hold_times: list[MICRO_S] = field(default_factory = list)
+
+    @property
+    def total_blocked_time(self) -> MICRO_S:
+        return sum(self.blocked_times)
+
+@dataclass
+class ContentionEvent:
+    time: MICRO_S
+    resource: Resource
+    event: str
+    pid: PID
+    queue_depth: int
+
+class ContentionProfiler:
+    """Collects contention statistics for every semaphore and mutex the kernel touches.
+    - The kernel calls acquired, blocked, woken and released as processes use resources.
+    - clock returns the current simulated time, the kernel itself has no notion of it.
+    """
+    clock: Callable[[], MICRO_S]
+    stats: dict[Resource, ResourceStats]
+    events: list[ContentionEvent]
+    blocked_since: dict[PID, tuple[Resource, MICRO_S]]
+    held_since: dict[tuple[Resource, PID], MICRO_S]
+
+    def __init__(self, clock: Callable[[], MICRO_S]):
+        self.clock = clock
+        self.stats = dict()
+        self.events = []
+        self.blocked_since = dict()
+        self.held_since = dict()
+
+    def acquired(self, resource: Resource, pid: PID):
+        stats = self._record(resource, "acquired", pid)
+        stats.acquisitions += 1
+        self._start_hold(resource, pid)
+
+    def blocked(self, resource: Resource, pid: PID):
+        stats = self.stats.setdefault(resource, ResourceStats())
+        stats.contended_acquisitions += 1
+        stats.queue_depth += 1
+        stats.max_queue_depth = max(stats.max_queue_depth, stats.queue_depth)
+        self.blocked_since[pid] = (resource, self.clock())
+        self._record(resource, "blocked", pid)
+
+    def woken(self, resource: Resource, pid: PID):
+        stats = self.stats[resource]
+        stats.queue_depth -= 1
+        stats.acquisitions += 1
+        _, start = self.blocked_since.pop(pid)
+        stats.blocked_times.append(self.clock() - start)
+        self._record(resource, "woken", pid)
+        self._start_hold(resource, pid)
+
+    def released(self, resource: Resource, pid: PID):
+        stats = self._record(resource, "released", pid)
+        start = self.held_since.pop((resource, pid), None)
+        if start is not None:
+            stats.hold_times.append(self.clock() - start)
+
+    def finish(self, now: MICRO_S):
+        """Counts waits and holds that are still open at the end of the run (e.g. because of a deadlock) as ending at now."""
+        for resource, start in self.blocked_since.values():
+            self.stats[resource].blocked_times.append(now - start)
+        for (resource, _), start in self.held_since.items():
+            self.stats[resource].hold_times.append(now - start)
+        self.blocked_since.clear()
+        self.held_since.clear()
+
+    def _start_hold(self, resource: Resource, pid: PID):
+        # Semaphores can be released by a different process than the one that acquired them,
+        # so hold time is only meaningful for mutex owners.
+        if resource[0] == "mutex":
+            self.held_since[(resource, pid)] = self.clock()
+
+    def _record(self, resource: Resource, event: str, pid: PID) -> ResourceStats:
+        stats = self.stats.setdefault(resource, ResourceStats())
+        self.events.append(ContentionEvent(self.clock(), resource, event, pid, stats.queue_depth))
+        return stats
+
+    def ranked(self) -> list[tuple[Resource, ResourceStats]]:
+        """Resources ordered from most to least contended."""
+        return sorted(self.stats.items(), key=lambda item: (item[1].total_blocked_time, item[1].contended_acquisitions), reverse=True)
+
+    def write_report(self, file: TextIO):
+        header = ["resource", "acquisitions", "contended", "max_queue", "blocked_total_us"]
+        header += [f"blocked_p{p}_us" for p in PERCENTILES]
+        header += ["hold_total_us", "hold_max_us"]
+        rows = [header]
+        for (kind, id), stats in self.ranked():
+            row = [f"{kind} {id}", stats.acquisitions, stats.contended_acquisitions, stats.max_queue_depth, stats.total_blocked_time]
+            row += [percentile(stats.blocked_times, p) for p in PERCENTILES]
+            if kind == "mutex":
+                row += [sum(stats.hold_times), max(stats.hold_times, default=0)]
+            else:
+                row += ["-", "-"]
+            rows.append([str(value) for value in row])
+
+        widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+        for row in rows:
+            file.write("  ".join(value.rjust(width) for value, width in zip(row, widths)).rstrip() + "\n")
+
+    def write_series(self, file: TextIO):
+        """Writes every contention event as CSV, one row per event, for plotting queue depth over time."""
+        writer = csv.writer(file)
+        writer.writerow(["time_us", "kind", "id", "event", "pid", "queue_depth"])
+        for event in self.events:
+            writer.writerow([event.time, event.resource[0], event.resource[1], event.event, event.pid, event.queue_depth])
+
+def percentile(values: list[MICRO_S], p: int) -> MICRO_S:
+    """Nearest-rank percentile, 0 when there are no values."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    rank = max(1, -(-p * len(ordered) // 100))
+    return ordered[rank - 1]
@@ -0,0 +1,50 @@
+from array import array
+from typing import TextIO
+import json
+
+from kernel import Kernel
+
+MICRO_S = int
+
+COLUMNS = ("time_us", "ready_queue", "fg_queue", "bg_queue", "blocked", "reserved_bytes", "free_bytes", "largest_free_bytes")
+
+class KernelSampler:
+    """Samples queue lengths and memory usage of the kernel every interval simulated microseconds.
+    - Every sample only reads lengths and counters the kernel keeps up to date, so it is O(1).
+    - Samples are stored column by column in compact integer arrays.
+    """
+    kernel: Kernel
+    interval: MICRO_S
+    next_sample: MICRO_S
+    columns: dict[str, array]
+
+    def __init__(self, kernel: Kernel, interval: MICRO_S):
+        assert(interval > 0)
+        self.kernel = kernel
+        self.interval = interval
+        self.next_sample = 0
+        self.columns = {name: array('q') for name in COLUMNS}
+
+    def sample(self, time: MICRO_S):
+        kernel = self.kernel
+        mmu = kernel.mmu
+        columns = self.columns
+        columns["time_us"].append(time)
+        columns["ready_queue"].append(len(kernel.ready_queue))
+        columns["fg_queue"].append(len(kernel.fg_queue))
+        columns["bg_queue"].append(len(kernel.bg_queue))
+        columns["blocked"].append(len(kernel.wait_for.blocked_on))
+        columns["reserved_bytes"].append(mmu.reserved_bytes)
+        columns["free_bytes"].append(mmu.memory_size - mmu.reserved_bytes)
+        columns["largest_free_bytes"].append(mmu.largest_available())
+        self.next_sample = time + self.interval
+
+    def write(self, file: TextIO):
+        """Writes the samples as a JSON object of columns.
+        - fragmentation is 1 - largest_free_bytes / free_bytes, the share of free memory
+            that can not be handed out as one block.
+        """
+        columns = {name: column.tolist() for name, column in self.columns.items()}
+        columns["fragmentation"] = [round(1 - largest / free, 4) if free else 0.0 \
+                                    for largest, free in zip(columns["largest_free_bytes"], columns["free_bytes"])]
+        json.dump({"interval_us": self.interval, "columns": columns}, file, separators=(',', ':'))
@@ -0,0 +1,114 @@
+"""Long-lived simulation server.
+
+Keeps the simulator and kernel imported in a pool of worker processes and accepts
+jobs over a Unix domain socket, so running a scenario does not pay for interpreter
+startup every time. Use client.py to submit jobs.
+
+Protocol: the client sends one JSON object per line and gets one JSON object back.
+    request:  {"description": <path>, "output": <path>, "options": <other simulate() arguments>}
+    response: {"status": "ok" | "error", "error": <message or null>, "elapsed_s": <float>}
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import hashlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import time
+
+from cli import DESCRIPTION, OUTPUT, OPTIONS, STATUS, ERROR, ELAPSED, socket_path
+from simulator import simulate
+
+SCHEDULER_FOLDER = Path(__file__).resolve().parent
+
+def sources_hash() -> str:
+    """Hash of every scheduler/*.py file, to notice when the loaded kernel is out of date."""
+    hasher = hashlib.sha256()
+    for source in sorted(SCHEDULER_FOLDER.glob("*.py")):
+        hasher.update(source.name.encode())
+        hasher.update(source.read_bytes())
+    return hasher.hexdigest()
+
+def server_running(path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+def ignore_interrupts():
+    """Leaves Ctrl-C handling to the server process so workers are shut down cleanly."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def run_job(description: str, output: str, options: dict) -> dict:
+    """Runs a single simulation inside a worker process and reports how it went."""
+    start = time.perf_counter()
+    error = None
+    try:
+        simulate(Path(description), Path(output), **options)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {STATUS: "ok" if error is None else "error", ERROR: error, ELAPSED: time.perf_counter() - start}
+
+class SimulationServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, workers: int | None):
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=ignore_interrupts)
+        # The workers keep the sources they were started with, so jobs are refused once these change.
+        self.sources_hash = sources_hash()
+        super().__init__(path, JobHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+
+class JobHandler(socketserver.StreamRequestHandler):
+    server: SimulationServer
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                job = json.loads(line)
+                if sources_hash() != self.server.sources_hash:
+                    raise RuntimeError("scheduler sources changed since the server started, restart server.py")
+                future = self.server.pool.submit(run_job, job[DESCRIPTION], job[OUTPUT], job.get(OPTIONS, {}))
+                response = future.result()
+            except Exception as e:
+                response = {STATUS: "error", ERROR: f"{type(e).__name__}: {e}", ELAPSED: 0.0}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+def print_usage():
+    print("Usage: python server.py <optional socket_path> <optional num_workers>")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4:
+        print_usage()
+    path = sys.argv[1] if len(sys.argv) >= 2 else socket_path()
+    workers = None
+    if len(sys.argv) == 3:
+        if not sys.argv[2].isdigit() or int(sys.argv[2]) == 0:
+            print_usage()
+        workers = int(sys.argv[2])
+
+    if os.path.exists(path):
+        if server_running(path):
+            print(f"A server is already listening on {path}")
+            sys.exit(1)
+        # Left behind by a server that did not shut down cleanly.
+        os.unlink(path)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with SimulationServer(path, workers) as server:
+        print(f"Listening on {path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
@@ -1,10 +1,16 @@
-from io import TextIOWrapper
+import asyncio
+from collections import deque
 import json
 from dataclasses import dataclass
 from pathlib import Path
+from typing import AsyncIterator, Callable, Iterator
 import sys
 
+from cli import parse_args
+from events import STUDENT_LOG, CallbackSubscriber, Event, Subscriber, TextLogger
 from kernel import Kernel, MMU
+from profiler import ContentionProfiler
+from sampler import KernelSampler
 
 MICRO_S = int
 PID = int
@@ -42,9 +48,14 @@ MEMORY_SIZE: str = "memory_size_MB"
 
 DEFAULT_PRIORITY = 32
 
+DEFAULT_SAMPLE_INTERVAL: MICRO_S = 100
+
 class SimulationError(Exception):
     pass
 
+class DeadlockError(SimulationError):
+    pass
+
 @dataclass
 class PriorityChangeEvent:
     arrival: MICRO_S
@@ -96,21 +107,23 @@ class Simulator:
     arrivals: list[Process]
     kernel: Kernel
     next_pid: PID
-    simlog: TextIOWrapper
-    needs_spacing: False
+    subscribers: list[Subscriber]
+    sampler: KernelSampler | None
     process_0_runtime: MICRO_S
     semaphores: dict[int, Semaphore]
     mutexes: dict[int, Mutex]
     student_logs: "StudentLogger"
     mmu: MMU
 
-    def __init__(self, emulation_description_path: Path, logfile_path: str, student_logs: bool):
+    def __init__(self, emulation_description_path: Path, logfile_path: str | None, student_logs: bool):
+        """logfile_path may be None to only deliver events to subscribers."""
         self.elapsed_time = 0
         self.current_process = 0
         self.processes = dict()
         self.arrivals = []
         self.next_pid = 1
-        self.needs_spacing = False
+        self.subscribers = []
+        self.sampler = None
         self.process_0_runtime = 0
         self.semaphores = dict()
         self.mutexes = dict()
@@ -234,29 +247,114 @@ class Simulator:
         assert("scheduling_algorithm" in emulation_json and emulation_json["scheduling_algorithm"] in VALID_SCHEDULING_ALGORITHMS)
         self.kernel = Kernel(emulation_json["scheduling_algorithm"], self.student_logs, self.mmu, memory_size_mb * MB_TO_BYTES)
 
-        self.simlog = open(logfile_path, 'w')
+        if logfile_path is not None:
+            self.subscribe(TextLogger(logfile_path))
 
     
     def run_simulator(self):
         # Emulation ends when all processes have finished.
-        while len(self.processes) + len(self.arrivals) > 0:
-            if self.current_process == 0:
-                self.process_0_runtime += 1
-            if self.process_0_runtime >= NUM_MICRO_IN_SEC:
-                raise SimulationError( \
-                """Process 0 (idle process) has been running for 1 second straight. 
-                This will not happen in tested simulations and is likely a bug in the kernel.""")
-            
-            self.advance_current_process()
-
-            self.check_for_arrival()
-
-            if self.elapsed_time != 0 and self.elapsed_time % TIMER_INTERRUPT_INTERVAL == 0:
-                self.switch_process(self.kernel.timer_interrupt())
-
-            self.log_add_spacing()
-            self.elapsed_time += 1
-        self.simlog.close()
+        try:
+            self.run_until(None)
+        finally:
+            self.close()
+
+    @property
+    def finished(self) -> bool:
+        return len(self.processes) + len(self.arrivals) == 0
+
+    def run_until(self, time: MICRO_S | None) -> bool:
+        """Advances the simulation until elapsed_time reaches time (or to the end if time is None).
+        - Returns whether the simulation has finished.
+        """
+        while not self.finished and (time is None or self.elapsed_time < time):
+            self.step()
+        self.flush()
+        return self.finished
+
+    def flush(self):
+        """Delivers events still waiting for a full batch to every subscriber."""
+        for subscriber in self.subscribers:
+            subscriber.flush()
+
+    def step(self):
+        """Simulates a single microsecond."""
+        if self.current_process == 0:
+            self.process_0_runtime += 1
+        if self.process_0_runtime >= NUM_MICRO_IN_SEC:
+            raise SimulationError( \
+            """Process 0 (idle process) has been running for 1 second straight. 
+            This will not happen in tested simulations and is likely a bug in the kernel.""")
+
+        self.advance_current_process()
+
+        self.check_for_arrival()
+
+        self.check_for_deadlock()
+
+        if self.elapsed_time != 0 and self.elapsed_time % TIMER_INTERRUPT_INTERVAL == 0:
+            self.switch_process(self.kernel.timer_interrupt())
+
+        if self.sampler is not None and self.elapsed_time >= self.sampler.next_sample:
+            self.sampler.sample(self.elapsed_time)
+
+        self.elapsed_time += 1
+
+    def subscribe(self, subscriber: Subscriber | Callable[[list[Event]], None], batch_size: int = 1) -> Subscriber:
+        """Delivers every future event to subscriber, which may be a plain callback taking a list of events."""
+        if not isinstance(subscriber, Subscriber):
+            subscriber = CallbackSubscriber(subscriber, batch_size)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscriber.flush()
+        self.subscribers.remove(subscriber)
+
+    def events(self, until: MICRO_S | None = None) -> Iterator[Event]:
+        """Yields events as the simulation advances, running it only as fast as they are consumed."""
+        received = deque()
+        subscriber = self.subscribe(received.extend)
+        try:
+            while not self.finished and (until is None or self.elapsed_time < until):
+                self.step()
+                while received:
+                    yield received.popleft()
+        finally:
+            self.unsubscribe(subscriber)
+            self.flush()
+
+    def batches(self, batch_size: int, until: MICRO_S | None = None) -> Iterator[list[Event]]:
+        """Like events() but yields lists of up to batch_size events."""
+        batch = []
+        for event in self.events(until):
+            batch.append(event)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def aevents(self, until: MICRO_S | None = None, steps_per_yield: int = 1000) -> AsyncIterator[Event]:
+        """Async version of events() that gives control back to the event loop every steps_per_yield microseconds."""
+        received = deque()
+        subscriber = self.subscribe(received.extend)
+        try:
+            steps = 0
+            while not self.finished and (until is None or self.elapsed_time < until):
+                self.step()
+                while received:
+                    yield received.popleft()
+                steps += 1
+                if steps >= steps_per_yield:
+                    steps = 0
+                    await asyncio.sleep(0)
+        finally:
+            self.unsubscribe(subscriber)
+            self.flush()
+
+    def close(self):
+        for subscriber in self.subscribers:
+            subscriber.close()
 
     def advance_current_process(self):
         if self.current_process == 0:
@@ -267,7 +365,7 @@ class Simulator:
 
         # If the current_process has finished execution
         if current_process.total_cpu_time <= current_process.elapsed_cpu_time:
-            self.log(f"Process {self.current_process} has finished execution and is exiting")
+            self.log("exit", self.current_process, f"Process {self.current_process} has finished execution and is exiting")
             self.exit_current_process()
             return
 
@@ -275,7 +373,7 @@ class Simulator:
         event_list = current_process.priority_change_events
         while len(event_list) > 0 and event_list[len(event_list) - 1].arrival <= current_process.elapsed_cpu_time:
             priority_change = event_list.pop()
-            self.log(f"Process {self.current_process} set priority to {priority_change.new_priority}")
+            self.log("set_priority", self.current_process, f"Process {self.current_process} set priority to {priority_change.new_priority}", priority=priority_change.new_priority)
             self.switch_process(self.kernel.syscall_set_priority(priority_change.new_priority))
 
 
@@ -283,14 +381,14 @@ class Simulator:
         while len(event_list) > 0 and event_list[len(event_list) - 1].arrival <= current_process.elapsed_cpu_time:
             semaphore_p = event_list.pop()
             self.check_semaphore_inited(semaphore_p.id)
-            self.log(f"Process {self.current_process} called p on semaphore {semaphore_p.id}")
+            self.log("semaphore_p", self.current_process, f"Process {self.current_process} called p on semaphore {semaphore_p.id}", id=semaphore_p.id)
             self.switch_process(self.kernel.syscall_semaphore_p(semaphore_p.id))
         
         event_list = current_process.semaphore_v_events
         while len(event_list) > 0 and event_list[len(event_list) - 1].arrival <= current_process.elapsed_cpu_time:
             semaphore_v = event_list.pop()
             self.check_semaphore_inited(semaphore_v.id)
-            self.log(f"Process {self.current_process} called v on semaphore {semaphore_v.id}")
+            self.log("semaphore_v", self.current_process, f"Process {self.current_process} called v on semaphore {semaphore_v.id}", id=semaphore_v.id)
             self.switch_process(self.kernel.syscall_semaphore_v(semaphore_v.id))
 
 
@@ -298,14 +396,14 @@ class Simulator:
         while len(event_list) > 0 and event_list[len(event_list) - 1].arrival <= current_process.elapsed_cpu_time:
             mutex_lock = event_list.pop()
             self.check_mutex_inited(mutex_lock.id)
-            self.log(f"Process {self.current_process} called lock on mutex {mutex_lock.id}")
+            self.log("mutex_lock", self.current_process, f"Process {self.current_process} called lock on mutex {mutex_lock.id}", id=mutex_lock.id)
             self.switch_process(self.kernel.syscall_mutex_lock(mutex_lock.id))
         
         event_list = current_process.mutex_unlock_events
         while len(event_list) > 0 and event_list[len(event_list) - 1].arrival <= current_process.elapsed_cpu_time:
             mutex_unlock = event_list.pop()
             self.check_mutex_inited(mutex_unlock.id)
-            self.log(f"Process {self.current_process} called unlock on mutex {mutex_unlock.id}")
+            self.log("mutex_unlock", self.current_process, f"Process {self.current_process} called unlock on mutex {mutex_unlock.id}", id=mutex_unlock.id)
             self.switch_process(self.kernel.syscall_mutex_unlock(mutex_unlock.id))
 
         event_list = current_process.memory_events
@@ -313,11 +411,12 @@ class Simulator:
             memory_event = event_list.pop()
             translation = self.mmu.translate(memory_event.address, self.current_process)
             if translation is None:
-                self.log(f"Process {self.current_process} tried to access virtual address 0x{memory_event.address:0x} which caused a segfault")
-                self.log(f"Process {self.current_process} has trapped and is forcefully exiting")
+                self.log("segfault", self.current_process, f"Process {self.current_process} tried to access virtual address 0x{memory_event.address:0x} which caused a segfault", address=memory_event.address)
+                self.log("trap", self.current_process, f"Process {self.current_process} has trapped and is forcefully exiting")
                 self.exit_current_process()
             else:
-                self.log(f"Process {self.current_process} accessed virtual address 0x{memory_event.address:0x} which translates to physical address 0x{translation:0x}")
+                self.log("memory_access", self.current_process, f"Process {self.current_process} accessed virtual address 0x{memory_event.address:0x} which translates to physical address 0x{translation:0x}", \
+                         address=memory_event.address, physical_address=translation)
 
     def exit_current_process(self):
         new_process = self.kernel.syscall_exit()
@@ -330,24 +429,44 @@ class Simulator:
 
     def check_semaphore_inited(self, id: int):
         if not self.semaphores[id].initilized:
-            self.log(f"Semaphore {id} initilized with value {self.semaphores[id].init_val}")
+            self.log("semaphore_init", self.current_process, f"Semaphore {id} initilized with value {self.semaphores[id].init_val}", id=id, value=self.semaphores[id].init_val)
             self.kernel.syscall_init_semaphore(id, self.semaphores[id].init_val)
             self.semaphores[id].initilized = True
 
     def check_mutex_inited(self, id: int):
         if not self.mutexes[id].initilized:
-            self.log(f"Mutex {id} initilized")
+            self.log("mutex_init", self.current_process, f"Mutex {id} initilized", id=id)
             self.kernel.syscall_init_mutex(id)
             self.mutexes[id].initilized = True
 
+    def check_for_deadlock(self):
+        # Only the owner can unlock a mutex, so a deadlock on mutexes alone can never resolve.
+        # Semaphores can be released by any process, so those are only reported once nothing else can run.
+        deadlock = self.kernel.deadlock
+        if deadlock is not None and all(kind == "mutex" for kind, _ in deadlock.resources):
+            raise DeadlockError(str(deadlock))
+
+        if self.current_process == 0 and len(self.arrivals) == 0 and len(self.processes) > 0:
+            blocked_on = self.kernel.wait_for.blocked_on
+            runnable = sorted(pid for pid in self.processes if pid not in blocked_on)
+            if runnable:
+                raise SimulationError( \
+                f"""Processes {runnable} can run but the idle process was scheduled instead. 
+                This is likely a bug in the kernel.""")
+            if deadlock is not None:
+                raise DeadlockError(str(deadlock))
+            blocked = ", ".join(f"{pid} on {kind} {id}" for pid, (kind, id) in sorted(blocked_on.items()))
+            raise DeadlockError(f"All remaining processes are blocked: {blocked}")
+
     def check_for_arrival(self):
         while len(self.arrivals) > 0 and self.arrivals[len(self.arrivals) - 1].arrival == self.elapsed_time:
             new_process = self.arrivals.pop()
             self.processes[self.next_pid] = new_process
-            self.log(f"{new_process.process_type} process {self.next_pid} arrived with priority {new_process.priority} requesting {new_process.memory_needed / MB_TO_BYTES}MB of memory")
+            self.log("arrival", self.next_pid, f"{new_process.process_type} process {self.next_pid} arrived with priority {new_process.priority} requesting {new_process.memory_needed / MB_TO_BYTES}MB of memory", \
+                     process_type=new_process.process_type, priority=new_process.priority, memory_needed=new_process.memory_needed)
             kernel_response = self.kernel.new_process_arrived(self.next_pid, new_process.priority, new_process.process_type, new_process.memory_needed)
             if kernel_response == -1:
-                self.log(f"Unable to allocate memory for new process. Dropping process.")
+                self.log("dropped", self.next_pid, f"Unable to allocate memory for new process. Dropping process.")
                 del self.processes[self.next_pid]
             else:
                 self.switch_process(kernel_response)
@@ -361,21 +480,13 @@ class Simulator:
             self.process_0_runtime = 0
 
         if new_process != self.current_process:
-            self.log(f"Context switching to pid: {new_process}")
+            self.log("context_switch", new_process, f"Context switching to pid: {new_process}")
         self.current_process = new_process
 
-    def log(self, str: str, student_log = False):
-        if student_log:
-            delimiter = '#'
-        else:
-            delimiter = ':'
-        self.simlog.write(f"{self.elapsed_time / 1000:.3f}ms {delimiter} {str}\n")
-        self.needs_spacing = True
-    
-    def log_add_spacing(self):
-        if self.needs_spacing:
-            self.simlog.write("\n")
-            self.needs_spacing = False
+    def log(self, kind: str, pid: PID, message: str, **args):
+        event = Event(self.elapsed_time, kind, pid, message, args)
+        for subscriber in self.subscribers:
+            subscriber.publish(event)
 
 class StudentLogger:
     __simluator: Simulator
@@ -385,7 +496,7 @@ class StudentLogger:
 
     def log(self, str: str):
         if self.__simluator is not None:
-            self.__simluator.log(str, student_log=True)
+            self.__simluator.log(STUDENT_LOG, self.__simluator.current_process, str)
 
 # Having events at the same time as other events in the same process could cause a desync between what the simulator thinks is running and what the handler does.
 # This assert ensures the process does not have this issue.
@@ -419,26 +530,34 @@ def assert_events_are_valid_and_not_at_same_time(process: Process):
     for event_arrival in event_arrivals:
         assert(event_arrival < process.total_cpu_time)
 
-def print_usage():
-    print("Usage: python simulator.py <simulation_description_path> <log_path> <optional --no-student-logs>")
-    sys.exit(1)
+def simulate(sim_description: Path, log_path: Path, student_logs: bool = True,
+             contention_report: Path | None = None, contention_series: Path | None = None,
+             samples: Path | None = None, sample_interval: MICRO_S = DEFAULT_SAMPLE_INTERVAL):
+    simulator = Simulator(sim_description, log_path, student_logs)
+    if samples is not None:
+        simulator.sampler = KernelSampler(simulator.kernel, sample_interval)
+    profiler = None
+    if contention_report is not None or contention_series is not None:
+        profiler = ContentionProfiler(lambda: simulator.elapsed_time)
+        simulator.kernel.profiler = profiler
+
+    try:
+        simulator.run_simulator()
+    finally:
+        if profiler is not None:
+            profiler.finish(simulator.elapsed_time)
+        if contention_report is not None:
+            with open(contention_report, 'w') as file:
+                profiler.write_report(file)
+        if contention_series is not None:
+            with open(contention_series, 'w', newline='') as file:
+                profiler.write_series(file)
+        if samples is not None:
+            # Also record the state the run ended in, which rarely falls on an interval boundary.
+            simulator.sampler.sample(simulator.elapsed_time)
+            with open(samples, 'w') as file:
+                simulator.sampler.write(file)
 
 
 if __name__ == "__main__":
-    student_logs = True
-    if len(sys.argv) <= 2 or len(sys.argv) >= 5:
-        print_usage()
-    if type(sys.argv[1]) is not str or type(sys.argv[2]) is not str:
-        print_usage()
-    if len(sys.argv) == 4:
-        if sys.argv[3] != "--no-student-logs":
-            print_usage()
-        else:
-            student_logs = False
-
-
-
-    sim_description = Path(sys.argv[1])
-    log_path = Path(sys.argv[2])
-    simulator = Simulator(sim_description, log_path, student_logs)
-    simulator.run_simulator()
\ No newline at end of file
+    simulate(**parse_args(sys.argv[1:]))